@@ -1,20 +1,53 @@
 import os
+import io
 import marshal
-import sys
 import subprocess
 import socket
 import time
+import functools
+import itertools
+import collections
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from . import p4errors
 from .p4file import P4File, Status
 
-MAX_CMD_LEN = 8190
-MAX_ARG_LEN = 8000  # max length of args string when combined, close to max, but leaving some extra margin
+if os.name == "nt":
+    MAX_CMD_LEN = 32766  # CreateProcess limit, p4 is started directly and no longer through cmd.exe
+else:
+    MAX_CMD_LEN = 131072  # well below ARG_MAX on any POSIX system
+MAX_ARG_LEN = MAX_CMD_LEN - 190  # max length of args string when combined, close to max, but leaving some extra margin
+HOST_ONLINE_CACHE_TIME = 30  # seconds before host_online checks the connection to the server again
+PENDING_CHANGELISTS_CACHE_TIME = 2  # seconds the list of pending changelists is reused for
+OPENED_FILES_CACHE_TIME = 2  # seconds the depot path -> changelist index of opened files is reused for
+FOLDER_SCAN_THREADS = 16  # threads used to list the folders in add_or_edit_folders
+WHERE_CACHE_SIZE = 4096  # max number of paths __where remembers, the least recently used ones are dropped first
+STDIN_FILE_COUNT = 50  # file lists longer than this are passed to p4 through stdin instead of the command line
+
+# fstat keys we look for while walking every key of a record, p4 -G hands back bytes keys
+_OTHER_OPEN_KEY = b"otherOpen"
+_ACTION_OWNER_KEY = b"actionOwner"
+# files with these head actions are gone from the depot, fstat_to_p4_files skips them unless asked not to
+_DELETED_HEAD_ACTIONS = frozenset(["delete", "move/delete"])
+# what fstat says about files that aren't in the depot, P4File.is_untracked looks for the same text
+_NO_SUCH_FILE = " - no such file(s)"
+# commands that don't open, move or submit anything, running any other command throws away the opened files index
+_READ_ONLY_COMMANDS = frozenset(["changes", "clients", "describe", "files", "fstat", "have", "info", "login",
+                                 "opened", "set", "where"])
+# commands that make, change or get rid of pending changelists, running one throws away the pending changelists list
+_CHANGELIST_COMMANDS = frozenset(["change", "submit", "shelve"])
+# the fstat fields a P4File is made from, asking for just these keeps the fstat output small
+P4FILE_FSTAT_FIELDS = ("depotFile", "clientFile", "haveRev", "headRev", "headTime", "action", "headAction",
+                       "otherOpen", "actionOwner")
 
 
 class P4Client(object):
+    # folder a client was made in -> folder its .p4config was found in, shared by all clients so making a lot of them
+    # in the same workspace doesn't walk up the same folders every time
+    __p4config_roots = {}
+
     def __init__(self, perforce_root, user=None, client=None, server=None, silent=True, max_parallel_connections=4):
         """
         Make a new P4Client
@@ -34,9 +67,18 @@ class P4Client(object):
         self.client = client
         self.server = server
 
-        if not self.__p4config_exists():
-            if not silent:
-                logging.warning("No .p4config file found in %s!" % self.perforce_root)
+        self.__where_cache = collections.OrderedDict()
+        self.__setting_cache = {}
+        self.__host_online_cache = None
+        self.__pending_changelists_cache = None
+        self.__opened_cache = None
+        self.__workspaces_cache = None
+        self.__server_parts = None
+
+        if self.__p4config_exists():
+            logging.info(".p4config found in %s" % self.perforce_root)
+        elif not silent:
+            logging.warning("No .p4config file found in %s!" % self.perforce_root)
 
         if user is None:
             self.user = self.get_p4_setting("P4USER")
@@ -69,6 +111,9 @@ class P4Client(object):
         Set the root of the perforce commands. This is important so it can use the proper .p4config file for the cmds
         """
         self.perforce_root = root
+        # p4 where and p4 set answer based on the .p4config of the root, so what was cached for the old one is stale
+        self.__where_cache.clear()
+        self.__setting_cache.clear()
 
     def set_max_parallel_connections(self, value):
         """
@@ -79,7 +124,8 @@ class P4Client(object):
         """
         self.max_parallel_connections = value
 
-    def run_cmd(self, cmd, args=[], file_list=[], use_global_options=True, online_check=True):
+    def run_cmd(self, cmd, args=[], file_list=[], use_global_options=True, online_check=False, files_from_stdin=None,
+                decode=False):
         """
         Reads the output stream of the command and returns it as a marshaled dict.
 
@@ -87,52 +133,112 @@ class P4Client(object):
         :param args: *list* of string arguments like ["-c", "27277"]
         :param file_list: *list* of string arguments like ["//depot/folder/file.atom", "D:/Games/Whatever.fbx]
         :param use_global_options: *bool*
-        :param online_check: *bool* if set to True, will first check if the remote server is reachable before executing the command.
+        :param online_check: *bool* if set to True, will first check if the remote server is reachable before executing the
+        command. When False, the command just runs and a failed connection is picked up from p4's own output
+        :param files_from_stdin: *bool* if set to True, file_list is written to stdin and read by p4 through the "-x -"
+        global option, so all the files are handled by a single p4 call no matter how long the list is. If None, this
+        happens when file_list holds more than STDIN_FILE_COUNT files or is too long to fit on a single command line
+        :param decode: *bool* if set to True, the keys and values of the marshaled dictionaries are decoded to strings
+        as they're read, instead of being handed back as bytes
         :return: *list* of dictionaries with either the marshaled returns of the command or dictionaries with the
         raw output of the command
         """
+        if cmd not in _READ_ONLY_COMMANDS:
+            self.__opened_cache = None
+        if cmd in _CHANGELIST_COMMANDS:
+            self.__pending_changelists_cache = None
+
+        # paths can come in as pathlib.Path or other non-str objects, p4 only gets to see their string version
+        file_list = [str(f) for f in file_list]
+
         if online_check:
             if not self.host_online():
                 logging.warning("Can't connect to %s on port %s" % (self.__server_address(), self.__port_number()))
 
-        if self.perforce_root is not None:
-            os.chdir(self.perforce_root)
+        if use_global_options:
+            global_options = ["-G", "-u", self.user, "-c", self.client]
+        else:
+            global_options = []
+
+        if files_from_stdin is None:
+            # past a handful of files, skip measuring them and go straight to stdin
+            files_from_stdin = len(file_list) > STDIN_FILE_COUNT or sum(len(f) + 1 for f in file_list) >= MAX_ARG_LEN
+
+        stdin_data = None
+        if files_from_stdin and len(file_list):
+            # one path per line
+            stdin_data = ("\n".join(file_list) + "\n").encode()
+            global_options += ["-x", "-"]
+            file_list = []
+
+        # split args and files into chunks that fit within the max size
+        arg_chunks = split_list_into_chunks_of_length(args, max_length=MAX_ARG_LEN)
+        file_chunks = split_list_into_chunks_of_length(file_list, max_length=MAX_ARG_LEN)
+
+        commands = []
+        for arg_chunk, file_chunk in itertools.product(arg_chunks, file_chunks):
+            command = ["p4"] + global_options + [cmd] + arg_chunk + file_chunk
+
+            # count the length instead of joining the command into a string we never use
+            command_length = sum(len(part) for part in command) + len(command) - 1
+            if command_length > MAX_CMD_LEN and logging.getLogger().isEnabledFor(logging.WARNING):
+                # This shouldn't happen, but just in case the command prefix end up really long
+                logging.warning(f"Command length: {command_length} exceeds MAX_CMD_LEN {MAX_CMD_LEN} on command: {cmd}")
+            commands.append(command)
+
+        # the common case is a single chunk of each, which makes this a single p4 call
+        if len(commands) == 1:
+            dict_list = self.__run_single_command(commands[0], stdin_data, decode)
+        else:
+            # every chunk is its own p4 process, so they can wait on the server at the same time
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_parallel_connections, len(commands)))) as pool:
+                results = pool.map(lambda command: self.__run_single_command(command, stdin_data, decode), commands)
+                dict_list = [info_dict for result in results for info_dict in result]
 
-        file_list = [f'"{f}"' for f in file_list]
+        if use_global_options:
+            self.__check_connection_error(dict_list)
 
-        # build arg and file strings within the max size
-        clamped_arg_list = split_list_into_strings_of_length(args, max_length=MAX_ARG_LEN)
-        clamped_file_list = split_list_into_strings_of_length(file_list, max_length=MAX_ARG_LEN)
+        return dict_list
+
+    def __run_single_command(self, command, stdin_data=None, decode=False):
+        """
+        Runs a single p4 command and reads its marshaled output
+
+        :param command: *list* full argv of the command, starting with "p4"
+        :param stdin_data: *bytes* data written to the stdin of the command
+        :param decode: *bool* decode the keys and values of the dictionaries to strings
+        :return: *list* of dictionaries with either the marshaled returns of the command or a dictionary with the
+        raw output of the command
+        """
+        # p4 picks up the .p4config file from its working directory
+        with subprocess.Popen(command,
+                              stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE,
+                              cwd=self.perforce_root or None) as pipe:
+            # communicate feeds stdin while reading stdout, p4 starts writing output before it has read
+            # all the files so writing everything first could deadlock on a full pipe
+            stdout_data, stderr_data = pipe.communicate(stdin_data)
 
         dict_list = []
-        for clamped_arg in clamped_arg_list:
-            for clamped_files in clamped_file_list:
-                if use_global_options:
-                    command = f"p4 -G -u {self.user} -c {self.client} {cmd} {clamped_arg} {clamped_files}"
-                else:
-                    command = f"p4 {cmd} {clamped_arg} {clamped_files}"
-
-                if len(command) > MAX_CMD_LEN:
-                    # This shouldn't happen, but just in case the command prefix end up really long
-                    logging.warning(f"Command length: {format(len(command))} exceeds MAX_CMD_LEN {MAX_CMD_LEN} on command: {MAX_CMD_LEN}")
-
-                with subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, shell=True) as pipe:
-                    output = pipe.stdout
-                    try:
-                        while True:
-                            value_dict = marshal.load(output)
-                            dict_list.append(value_dict)
-                    except EOFError:
-                        pass
-                    except ValueError as error:
-                        output_dict = {
-                            "command": command,
-                            "code": "error",
-                            "error": str(error),
-                            "raw_output": subprocess.check_output(command, stderr=subprocess.STDOUT, shell=True)
-                        }
-                        dict_list.append(output_dict)
-                    pipe.kill()
+        output = io.BytesIO(stdout_data)
+        try:
+            while True:
+                value_dict = marshal.load(output)
+                if decode:
+                    value_dict = decode_dictionary(value_dict)
+                dict_list.append(value_dict)
+        except EOFError:
+            pass
+        except ValueError as error:
+            # not marshaled output, hand back what p4 printed instead of running the command again
+            output_dict = {
+                "command": " ".join(command),
+                "code": "error",
+                "error": str(error),
+                "raw_output": stdout_data + stderr_data
+            }
+            dict_list.append(output_dict)
 
         return dict_list
 
@@ -146,7 +252,7 @@ class P4Client(object):
             return None
         result = self.run_cmd("login", args=["-s"])
         info_dict = result[0]
-        expiration_seconds = self.__get_dict_value(info_dict, "TicketExpiration", None)
+        expiration_seconds = get_dict_value(info_dict, "TicketExpiration", None)
         if expiration_seconds is not None:
             return int(expiration_seconds)
         return None
@@ -157,27 +263,31 @@ class P4Client(object):
 
         :param setting: *string*
         :return: setting value. In case a bad marshal object is returned and the function can't find the settings,
-        the entire info dictionary from Perforce is returned
+        the entire info dictionary from Perforce is returned. Values are cached, use invalidate_cache() to read them again
         """
+        if setting in self.__setting_cache:
+            return self.__setting_cache[setting]
+
         try:
             # skipping the online check for setting commands
             info_dict = self.run_cmd("set", [setting], use_global_options=False, online_check=False)[0]
         except:
             raise p4errors.WorkSpaceError("Unable to find setting %s" % setting)
 
-        raw_output = self.__get_dict_value(info_dict, "raw_output", None)
+        raw_output = get_dict_value(info_dict, "raw_output", None)
 
-        if raw_output is not None:
-            if raw_output == b"":
-                return None
+        value = None
+        if raw_output is not None and raw_output != b"":
             try:
                 raw_output = raw_output.split("=")[1].split(" ")[0].rstrip()
             except:
                 raw_output = raw_output.decode("utf-8").split("=")[1].split(" ")[0].rstrip()
 
-            if raw_output == "none":
-                return None
-            return raw_output
+            if raw_output != "none":
+                value = raw_output
+
+        self.__setting_cache[setting] = value
+        return value
 
     def find_p4_client(self):
         """
@@ -200,13 +310,24 @@ class P4Client(object):
         """
         Chooses a workspace to be used in calls with this P4Client instance
         """
-        workspaces = self.get_all_workspaces()
-        if workspace in workspaces:
+        # only ask the server again when the cached list doesn't know about the workspace yet
+        if workspace in self.get_all_workspaces() or workspace in self.get_all_workspaces(refresh=True):
             self.client = workspace
         else:
             raise p4errors.WorkSpaceError("Tried to set a workspace/client({}) that did not exist".format(workspace))
 
-    def files_to_p4files(self, file_list, allow_invalid_files=False):
+    def invalidate_cache(self):
+        """
+        Clears all the workspace information this client has cached, so the next calls ask the server again
+        """
+        self.__where_cache.clear()
+        self.__setting_cache.clear()
+        self.__host_online_cache = None
+        self.__pending_changelists_cache = None
+        self.__opened_cache = None
+        self.__workspaces_cache = None
+
+    def files_to_p4files(self, file_list, allow_invalid_files=False, fields=P4FILE_FSTAT_FIELDS):
         """
         Turns a list of files into P4File objects. If the Perforce server can't be reached, returns a list of P4Files
         that have their local path set and their status set to UNKNOWN
@@ -214,12 +335,14 @@ class P4Client(object):
         :param file_list: *list* of file paths
         :param allow_invalid_files: *bool* if set to False, this function will skip any files that are deleted or
         marked for delete
+        :param fields: *list* of fstat fields to ask the server for, eg. ["depotFile", "action"]. Defaults to the
+        fields a P4File uses, pass None to get all fields in the raw data
         :return: *list* P4Files
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
 
         if self.host_online():
-            fstat_output = self.run_cmd("fstat", file_list=file_list)
+            fstat_output = self.run_cmd("fstat", args=fstat_field_args(fields), file_list=file_list)
             p4files = self.fstat_to_p4_files(fstat_output, allow_invalid_files=allow_invalid_files)
             return p4files
         else:
@@ -232,7 +355,42 @@ class P4Client(object):
                 p4files.append(perforce_file)
             return p4files
 
-    def folder_to_p4files(self, folder, include_subfolders=True, allow_invalid_files=False):
+    def refresh_p4files(self, p4files):
+        """
+        Updates the P4Files with the latest information from the server. Unlike calling update_self on each of them,
+        this runs a single fstat for all the files
+
+        :param p4files: *list* of P4Files
+        :return: *list* of the same P4Files, updated in place
+        """
+        p4files = convert_to_list(p4files)
+        search_files = [p4file.get_depot_file_path() or p4file.get_local_file_path() for p4file in p4files]
+
+        paths = [path for path in search_files if path is not None]
+        if not len(paths):
+            return p4files
+
+        # files that got deleted since the P4Files were made still need their new status
+        refreshed_files = {}
+        for refreshed in self.files_to_p4files(paths, allow_invalid_files=True):
+            refreshed_files[refreshed.get_depot_file_path()] = refreshed
+            local_file_path = refreshed.get_local_file_path()
+            if local_file_path is not None:
+                refreshed_files[os.path.normcase(os.path.normpath(local_file_path))] = refreshed
+
+        for p4file, search_file in zip(p4files, search_files):
+            if search_file is None:
+                continue
+            refreshed = refreshed_files.get(search_file)
+            if refreshed is None:
+                refreshed = refreshed_files.get(os.path.normcase(os.path.normpath(search_file)))
+            if refreshed is not None:
+                p4file.update_from(refreshed)
+
+        return p4files
+
+    def folder_to_p4files(self, folder, include_subfolders=True, allow_invalid_files=False,
+                          fields=P4FILE_FSTAT_FIELDS):
         """
         Returns all the files in a folder as a list of P4File objects. Uses the files_to_p4files function if the host
         is offline
@@ -241,6 +399,8 @@ class P4Client(object):
         :param include_subfolders: *bool*
         :param allow_invalid_files:  *bool* if set to False, this function will skip any files that are deleted or
         marked for delte
+        :param fields: *list* of fstat fields to ask the server for, eg. ["depotFile", "action"]. Defaults to the
+        fields a P4File uses, pass None to get all fields in the raw data
         :return: *list* P4Files
         """
 
@@ -250,22 +410,13 @@ class P4Client(object):
             else:
                 folder = folder + "*" if folder.endswith("/") or folder.endswith("\\") else folder + "/*"
 
-            fstat_output = self.run_cmd("fstat", file_list=[folder])
+            fstat_output = self.run_cmd("fstat", args=fstat_field_args(fields), file_list=[folder])
             p4files = self.fstat_to_p4_files(fstat_output, allow_invalid_files=allow_invalid_files)
             return p4files
 
         else:
-            if include_subfolders:
-                all_files = []
-                for root, dirs, files in os.walk(folder):
-                    for file_name in files:
-                        complete_file_path = os.path.join(root, file_name)
-                        if not complete_file_path in files:
-                            all_files.append(complete_file_path)
-            else:
-                all_files = [os.path.join(folder, file) for file in os.listdir(folder) if os.path.isfile(os.path.join(folder, file))]
-
-            return self.files_to_p4files(all_files)
+            all_files = list_files_in_folder(self.__root_path(folder), include_subfolders=include_subfolders)
+            return self.files_to_p4files(all_files, fields=fields)
 
     def make_new_changelist(self, description):
         """
@@ -279,10 +430,16 @@ class P4Client(object):
             #raise p4errors.ServerOffline("Can't connect to %s on port %s" % (self.__server_address(), self.__port_number()))
             return
 
-        output = subprocess.check_output('p4 --field "Description=%s" --field "Files=" change -o | p4 change -i' % description,
+        # feed the change form straight into "change -i" instead of piping the two commands through a shell
+        change_form = subprocess.check_output(["p4", "--field", "Description=%s" % description, "--field", "Files=",
+                                               "change", "-o"],
+                                              cwd=self.perforce_root or None)
+        output = subprocess.check_output(["p4", "change", "-i"],
+                                         input=change_form,
                                          stderr=subprocess.STDOUT,
-                                         shell=True).decode()
+                                         cwd=self.perforce_root or None).decode()
         changelist_number = output.split(" ")[1]
+        self.__pending_changelists_cache = None
         return int(changelist_number)
 
     def changelist_exists(self, changelist):
@@ -292,15 +449,16 @@ class P4Client(object):
         :param changelist: *str* or *int* changelist number or description
         :return: *bool*
         """
-        if type(changelist) == int:
-            if changelist in self.get_pending_changelists():
-                return True
-        else:
-            changelist = str(changelist)
-            changelists = self.get_pending_changelists(description_filter=changelist, perfect_match_only=True, case_sensitive=True)
-            if len(changelists):
-                return True
-            return False
+        if changelist == "default":
+            return True
+
+        if isinstance(changelist, int):
+            return changelist in self.get_pending_changelists()
+
+        changelist = str(changelist)
+        changelists = self.get_pending_changelists(description_filter=changelist, perfect_match_only=True, case_sensitive=True)
+        # > 1 because "default" is always appended
+        return len(changelists) > 1
 
     def move_files_to_changelist(self, file_list, changelist="default"):
         """
@@ -310,13 +468,10 @@ class P4Client(object):
         :param changelist: *string* or *int* changelist description or changelist number
         :return: *list* of info dictionaries
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
         changelist = self.__ensure_changelist(changelist)
         info_dicts = self.run_cmd("reopen", args=["-c", changelist], file_list=file_list)
-
-        for info_dict in info_dicts:
-            if self.__get_dict_value(info_dict, "code") == "error" and not self.silent:
-                logging.error(self.__get_dict_value(info_dict, "data"))
+        self.__log_errors(info_dicts)
 
         return info_dicts
 
@@ -330,10 +485,13 @@ class P4Client(object):
         :return: *list* of info dictionaries
         """
         target_changelist = self.__ensure_changelist(target_changelist)
-        files_to_move = []
-        for source_cl in source_changelists:
-            source_cl = self.__ensure_changelist(source_cl)
-            files_to_move.extend(self.get_files_in_changelist(source_cl))
+        source_changelists = set(str(self.__ensure_changelist(source_cl))
+                                 for source_cl in convert_to_list(source_changelists))
+
+        # one "p4 opened" for the whole workspace instead of one per source changelist, this also covers the default
+        # changelist, which "p4 describe" can't do
+        files_to_move = [get_dict_value(info_dict, "depotFile") for info_dict in self.run_cmd("opened")
+                         if get_dict_value(info_dict, "change") in source_changelists]
 
         result = self.move_files_to_changelist(files_to_move, target_changelist)
         return result
@@ -351,7 +509,7 @@ class P4Client(object):
         changelist = self.__ensure_changelist(changelist)
 
         info_dict = self.run_cmd("move", args=["-c", str(changelist)], file_list=[old_file_path, new_file_path])[0]
-        if self.__get_dict_value(info_dict, "code") != "error":
+        if get_dict_value(info_dict, "code") != "error":
             return True
         return False
 
@@ -367,7 +525,7 @@ class P4Client(object):
         changelist = self.__ensure_changelist(changelist)
 
         info_dict = self.run_cmd("copy", args=["-c", str(changelist)], file_list=[original_file_path, copied_file_path])[0]
-        if self.__get_dict_value(info_dict, "code") != "error":
+        if get_dict_value(info_dict, "code") != "error":
             return True
         return False
 
@@ -379,7 +537,7 @@ class P4Client(object):
         :param unchanged_only: *bool*
         :return: *list* of info dictionaries
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
         if not self.silent:
             self.__validate_file_list(file_list)
         if unchanged_only:
@@ -397,16 +555,11 @@ class P4Client(object):
         :param unchanged_only: *bool*
         :return: *list* of info dicts
         """
-        folder_list = convert_to_list(folder_list) if not isinstance(folder_list, list) else folder_list
+        folder_list = convert_to_list(folder_list)
         if not self.silent:
             self.__validate_file_list(folder_list)
 
-        cleaned_folder_list = []
-        for folder in folder_list:
-            folder = folder.replace("\\", "/")
-            folder = folder.rstrip("/")
-            folder += "/..."
-            cleaned_folder_list.append(folder)
+        cleaned_folder_list = recursive_folder_paths(folder_list)
 
         if unchanged_only:
             info_dicts = self.run_cmd("revert", ["-a"], file_list=cleaned_folder_list)
@@ -440,32 +593,31 @@ class P4Client(object):
             self.revert_changelist(unchanged_only=True, changelist=changelist)
 
         info_dicts = self.run_cmd("submit", args=["-c", changelist, "--parallel", f"threads={self.max_parallel_connections}"])
+        self.__pending_changelists_cache = None
         return info_dicts
 
     def sync_folders(self, folder_list):
         """
-        Recursively syncs complete folders
+        Recursively syncs complete folders. All folders are synced in a single p4 call
 
         :param folder_list: *list* folder paths
         :return: *list* of info dicts
         """
-        folder_list = convert_to_list(folder_list) if not isinstance(folder_list, list) else folder_list
+        folder_list = convert_to_list(folder_list)
         if not self.silent:
             self.__validate_file_list(folder_list)
 
-        cleaned_folder_list = []
-        for folder in folder_list:
-            folder = folder.replace("\\", "/")
-            folder = folder.rstrip("/")
-            folder += "/..."
-            cleaned_folder_list.append(folder)
+        cleaned_folder_list = recursive_folder_paths(remove_nested_folders(folder_list))
 
-        info_dicts = self.run_cmd("sync", args=["--parallel", f"threads={self.max_parallel_connections}"], file_list=cleaned_folder_list)
+        info_dicts = self.run_cmd("sync",
+                                  args=["--parallel", f"threads={self.max_parallel_connections}"],
+                                  file_list=cleaned_folder_list,
+                                  files_from_stdin=True)
         return info_dicts
 
     def sync_files(self, file_list, revision=-1, verify=True, force=False):
         """
-        Syncs files
+        Syncs files. All files are synced in a single p4 call
 
         :param file_list: *list*
         :param verify: *bool* if true, checks that file synced files exist on disk. Throws a warning if they don't
@@ -474,7 +626,7 @@ class P4Client(object):
         :param force: *bool* force sync
         :return: *list* of info dicts
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
         if revision != -1:
             verify = False
             file_list = [f"{path}#{revision}" for path in file_list]
@@ -483,12 +635,12 @@ class P4Client(object):
         if not self.silent:
             self.__validate_file_list(file_list)
 
-        info_dicts = self.run_cmd("sync", args=initial_arg_list, file_list=file_list)
+        info_dicts = self.run_cmd("sync", args=initial_arg_list, file_list=file_list, files_from_stdin=True)
 
         if verify:
             local_file_paths = self.get_local_paths(file_list)
             for local_file_path in local_file_paths:
-                if not os.path.isfile(local_file_path):
+                if not os.path.isfile(self.__root_path(local_file_path)):
                     logging.warning(f"File didn't exist after syncing, try force syncing it instead: {local_file_path}")
 
         return info_dicts
@@ -501,7 +653,7 @@ class P4Client(object):
         :param changelist: string or int value
         :return: *list* of info dicts
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
 
         changelist = self.__ensure_changelist(changelist)
 
@@ -516,16 +668,11 @@ class P4Client(object):
         :param changelist: string or int value
         :return: *list* of info dicts
         """
-        folder_list = convert_to_list(folder_list) if not isinstance(folder_list, list) else folder_list
+        folder_list = convert_to_list(folder_list)
         if not self.silent:
             self.__validate_file_list(folder_list)
 
-        cleaned_folder_list = []
-        for folder in folder_list:
-            folder = folder.replace("\\", "/")
-            folder = folder.rstrip("/")
-            folder += "/..."
-            cleaned_folder_list.append(folder)
+        cleaned_folder_list = recursive_folder_paths(folder_list)
 
         changelist = self.__ensure_changelist(changelist)
 
@@ -540,7 +687,7 @@ class P4Client(object):
         :param changelist: *string* or *int* changelist number
         :return: *list* of info dictionaries
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
         if not self.silent:
             self.__validate_file_list(file_list)
 
@@ -561,6 +708,7 @@ class P4Client(object):
         for cl in cl_num:
             info_dicts.append(self.run_cmd('change', args=['-d', cl]))
             # TODO: Break down info dicts and look for errors
+        self.__pending_changelists_cache = None
         return info_dicts
 
     def get_shelved_files(self):
@@ -571,14 +719,24 @@ class P4Client(object):
         :return:
         """
         files_and_cl = []
-        changelists = self.get_pending_changelists()
-        info_dicts = self.run_cmd("describe", args=["-S", " ".join("%s" % cl for cl in changelists)])
+        # the default changelist can't be described and can't hold shelved files either
+        changelists = [str(cl) for cl in self.get_pending_changelists() if cl != "default"]
+        if not len(changelists):
+            return files_and_cl
+
+        info_dicts = self.run_cmd("describe", args=["-S"], file_list=changelists, files_from_stdin=True, decode=True)
         for info_dict in info_dicts:
-            for key in info_dict.keys():
-                if b"depotFile" in key:
-                    depot_file = self.__get_dict_value(info_dict, key)
-                    changelist = int(self.__get_dict_value(info_dict, "change"))
-                    files_and_cl.append([depot_file, changelist])
+            # describe lists the files as depotFile0, depotFile1, ... so look them up by index until one is missing
+            if "depotFile0" not in info_dict:
+                continue
+
+            changelist = int(info_dict["change"])
+            index = 0
+            depot_file_key = "depotFile0"
+            while depot_file_key in info_dict:
+                files_and_cl.append([info_dict[depot_file_key], changelist])
+                index += 1
+                depot_file_key = "depotFile%d" % index
 
         return files_and_cl
 
@@ -590,53 +748,77 @@ class P4Client(object):
         :param include_subfolders: *bool*
         :param changelist: *string* or *int* changelist number or description. Will be made if it doesn't exist.*string* or *int* changelist number
         """
-        folders = convert_to_list(folders) if not isinstance(folders, list) else folders
+        # the folders are listed here in Python, relative ones have to point to the same place p4 would look
+        folders = [self.__root_path(folder) for folder in convert_to_list(folders)]
 
-        all_files = []
-        for folder in folders:
-            if include_subfolders:
-                for root, dirs, files in os.walk(folder):
-                    for file_name in files:
-                        complete_file_path = os.path.join(root, file_name)
-                        if not complete_file_path in files:
-                            all_files.append(complete_file_path)
-            else:
-                all_files.extend([os.path.join(folder, file) for file in os.listdir(folder) if os.path.isfile(os.path.join(folder, file))])
+        if include_subfolders:
+            all_files = list_files_in_folders(folders, max_workers=FOLDER_SCAN_THREADS)
+        else:
+            all_files = []
+            for folder in folders:
+                all_files.extend(list_files_in_folder(folder, include_subfolders=False))
 
         return self.add_or_edit_files(all_files, changelist=changelist)
 
-    def add_or_edit_files(self, file_list, changelist="default"):
+    def add_or_edit_files(self, file_list, changelist="default", use_reconcile=False):
         """
         Marks the files in file_list for add if they are new, or edit if they are already versioned
 
         :param file_list: *list* (ideally)
         :param changelist: *string* or *int* changelist number or description. Will be made if it doesn't exist.*string* or *int* changelist number
+        :param use_reconcile: *bool* let a single "p4 reconcile -e -a" decide between add and edit on the server. Only
+        versioned files whose content actually changed will be opened for edit in that case
         :return: *list* of info dictionaries
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
         if not self.silent:
             self.__validate_file_list(file_list)
 
+        if use_reconcile:
+            changelist = self.__ensure_changelist(changelist)
+            return self.run_cmd("reconcile", args=["-e", "-a", "-c", changelist], file_list=file_list,
+                                files_from_stdin=True)
+
         files_for_add = []
         files_for_checkout = []
         all_info_dicts = []
 
-        p4files = self.files_to_p4files(file_list, allow_invalid_files=True)
-        for p4file in p4files:
-            if p4file.is_checked_out():
+        # only the fields needed to tell new, versioned, deleted and already opened files apart
+        fstat_output = self.run_cmd("fstat",
+                                    args=fstat_field_args(["depotFile", "clientFile", "action", "headAction"]),
+                                    file_list=file_list)
+        for info_dict in fstat_output:
+            if get_dict_value(info_dict, "code") == "error":
+                # fstat has no clientFile for files it doesn't know, their path is only in the error message
+                message = get_dict_value(info_dict, "data", "")
+                if _NO_SUCH_FILE in message:
+                    files_for_add.append(message.split(_NO_SUCH_FILE)[0].strip())
                 continue
-            if p4file.is_local_only():
-                files_for_add.append(p4file.get_local_file_path())
-            elif p4file.get_depot_file_path() is not None:
-                files_for_checkout.append(p4file.get_depot_file_path())
-
-        if len(files_for_add):
-            info_dicts = self.add_files(file_list, changelist=changelist)
-            all_info_dicts.extend(info_dicts)
 
-        if len(files_for_checkout):
-            info_dicts = self.edit_files(file_list, changelist=changelist)
-            all_info_dicts.extend(info_dicts)
+            client_file = get_dict_value(info_dict, "clientFile")
+            if get_dict_value(info_dict, "action") is not None or client_file is None:
+                continue
+            # p4 edit refuses files that are deleted at head, those need to be added again
+            if get_dict_value(info_dict, "headAction") in _DELETED_HEAD_ACTIONS:
+                files_for_add.append(client_file)
+            else:
+                files_for_checkout.append(client_file)
+
+        # resolve a description once here, instead of add_files and edit_files both looking it up
+        if len(files_for_add) or len(files_for_checkout):
+            changelist = self.__ensure_changelist(changelist)
+
+        if len(files_for_add) and len(files_for_checkout):
+            # the add and the edit don't touch the same files, so they can run at the same time
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                add_future = executor.submit(self.add_files, files_for_add, changelist=changelist)
+                edit_future = executor.submit(self.edit_files, files_for_checkout, changelist=changelist)
+                all_info_dicts.extend(add_future.result())
+                all_info_dicts.extend(edit_future.result())
+        elif len(files_for_add):
+            all_info_dicts.extend(self.add_files(files_for_add, changelist=changelist))
+        elif len(files_for_checkout):
+            all_info_dicts.extend(self.edit_files(files_for_checkout, changelist=changelist))
 
         return all_info_dicts
 
@@ -645,13 +827,44 @@ class P4Client(object):
         Returns the number of the changelist the file is in, or -1 if the file isn't in any changelist
 
         :param depot_path: *string* depot_path of the file
-        :return: *int* number of changelist
+        :return: *int* number of changelist, or "default" if the file is in the default changelist
         """
-        info_dicts = self.run_cmd("opened", args=["-a", "-u", self.user])
-        for info_dict in info_dicts:
-            if depot_path == self.__get_dict_value(info_dict, "depotFile"):
-                return int(self.__get_dict_value(info_dict, "change"))
-        return -1
+        return self.__get_opened_index().get(depot_path, -1)
+
+    def get_changelists_for_files(self, depot_paths):
+        """
+        Returns the changelist every file in depot_paths is in, -1 for files that aren't in any changelist. Asks the
+        server once for all the files, instead of once per file like get_changelist_for_file would
+
+        :param depot_paths: *list* of depot paths
+        :return: *dict* of {depot_path: changelist number}
+        """
+        opened_index = self.__get_opened_index()
+        return {depot_path: opened_index.get(depot_path, -1) for depot_path in convert_to_list(depot_paths)}
+
+    def __get_opened_index(self):
+        """
+        Returns a dictionary of the depot paths of all the files this user has opened, pointing to the changelist
+        they're in. The index is reused for OPENED_FILES_CACHE_TIME seconds, or until a command runs that might
+        open, move or revert files
+
+        :return: *dict* of {depot_path: changelist number}, files in the default changelist point to "default"
+        """
+        if self.__opened_cache is not None:
+            check_time, user, opened_index = self.__opened_cache
+            if user == self.user and time.monotonic() - check_time < OPENED_FILES_CACHE_TIME:
+                return opened_index
+
+        opened_index = {}
+        for info_dict in self.run_cmd("opened", args=["-a", "-u", self.user]):
+            depot_path = get_dict_value(info_dict, "depotFile")
+            change = get_dict_value(info_dict, "change")
+            if depot_path is None or change is None:
+                continue
+            opened_index[depot_path] = int(change) if change.isdigit() else change
+
+        self.__opened_cache = (time.monotonic(), self.user, opened_index)
+        return opened_index
 
     def edit_files(self, file_list, changelist="default"):
         """
@@ -661,16 +874,14 @@ class P4Client(object):
         :param changelist: *string* or *int* changelist number or description. Will be made if it doesn't exist.
         :return: *list* of info dictionaries
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
         if not self.silent:
             self.__validate_file_list(file_list)
 
         changelist = self.__ensure_changelist(changelist)
 
-        info_dicts = self.run_cmd("edit", args=["-c", changelist], file_list=file_list)
-        for info_dict in info_dicts:
-            if self.__get_dict_value(info_dict, "code") == "error" and not self.silent:
-                logging.error(self.__get_dict_value(info_dict, "data"))
+        info_dicts = self.run_cmd("edit", args=["-c", changelist], file_list=file_list, files_from_stdin=True)
+        self.__log_errors(info_dicts)
         return info_dicts
 
     def add_files(self, file_list, changelist="default"):
@@ -680,13 +891,13 @@ class P4Client(object):
         :param changelist:  *string* or *int* changelist number or description. Will be made if it doesn't exist.
         :return: *list* of info dictionaries
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
         if not self.silent:
             self.__validate_file_list(file_list)
 
         changelist = self.__ensure_changelist(changelist)
 
-        info_dicts = self.run_cmd("add", args=["-c", changelist], file_list=file_list)
+        info_dicts = self.run_cmd("add", args=["-c", changelist], file_list=file_list, files_from_stdin=True)
         return info_dicts
 
     def get_files_in_changelist(self, changelist="default"):
@@ -697,15 +908,10 @@ class P4Client(object):
         :return: *list* of depot paths
         """
         changelist = self.__ensure_changelist(changelist)
-        depot_paths = []
-
         info_dicts = self.run_cmd("opened", args=["-c", changelist])
-        for info_dict in info_dicts:
-            for key, value in info_dict.items():
-                if "depotFile" in key.decode():
-                    depot_paths.append(value.decode())
-
-        return depot_paths
+        # only the depot path gets decoded, the rest of each record is never looked at
+        return [depot_path for depot_path in (get_dict_value(info_dict, "depotFile") for info_dict in info_dicts)
+                if depot_path is not None]
 
     def get_all_files_in_all_changelists(self):
         """
@@ -713,15 +919,9 @@ class P4Client(object):
 
         :return: *list*
         """
-        depot_paths = []
-
         info_dicts = self.run_cmd("opened")
-        for info_dict in info_dicts:
-            for key, value in info_dict.items():
-                if "depotFile" in key.decode():
-                    depot_paths.append(value.decode())
-
-        return depot_paths
+        return [depot_path for depot_path in (get_dict_value(info_dict, "depotFile") for info_dict in info_dicts)
+                if depot_path is not None]
 
     def get_pending_changelists(self, description_filter="", perfect_match_only=False, case_sensitive=False, descriptions=False):
         """
@@ -733,28 +933,26 @@ class P4Client(object):
         :param descriptions: *bool* if set to True, will return the changelist description instead of the changelist number
         :return: *list* with changelist numbers as ints
         """
-        info_dicts = self.run_cmd("changes", args=["-l", "-s", "pending", "-u", self.user, "-c", self.client])
-        changelists = []
-
-        for info_dict in info_dicts:
-            description_filter = description_filter.rstrip("\n")
-            cl_description = self.__get_dict_value(info_dict, "desc").rstrip("\n")
+        description_filter = description_filter.rstrip("\n")
+        if not case_sensitive:
+            description_filter = description_filter.lower()
 
+        changelists = []
+        for change, cl_description, cl_description_lower in self.__get_pending_changelist_info():
             if not case_sensitive:
-                description_filter = description_filter.lower()
-                cl_description = cl_description.lower()
+                cl_description = cl_description_lower
 
             # no filter means just add all the changelists
             if description_filter == "":
-                changelists.append([self.__get_dict_value(info_dict, "change"), cl_description])
+                changelists.append([change, cl_description])
             # else, apply filters
             else:
                 if perfect_match_only:
                     if description_filter == cl_description:
-                        changelists.append([self.__get_dict_value(info_dict, "change"), cl_description])
+                        changelists.append([change, cl_description])
                 else:
                     if description_filter in cl_description:
-                        changelists.append([self.__get_dict_value(info_dict, "change"), cl_description])
+                        changelists.append([change, cl_description])
 
         if descriptions:
             return_list = [pair[1] for pair in changelists]
@@ -764,6 +962,31 @@ class P4Client(object):
             return_list.append("default")
         return return_list
 
+    def __get_pending_changelist_info(self):
+        """
+        Returns the number and description of this user's pending changelists in this workspace, as reported by
+        "p4 changes". The result is reused for PENDING_CHANGELISTS_CACHE_TIME seconds, since resolving changelists by
+        description tends to ask for this list a couple of times in a row
+
+        :return: *list* of (change, description, lowercase description) tuples
+        """
+        if self.__pending_changelists_cache is not None:
+            check_time, user, client, changelists = self.__pending_changelists_cache
+            if (user, client) == (self.user, self.client) and time.monotonic() - check_time < PENDING_CHANGELISTS_CACHE_TIME:
+                return changelists
+
+        info_dicts = self.run_cmd("changes", args=["-l", "-s", "pending", "-u", self.user, "-c", self.client])
+        changelists = []
+        for info_dict in info_dicts:
+            description = get_dict_value(info_dict, "desc")
+            if description is None:
+                continue
+            description = description.rstrip("\n")
+            changelists.append((get_dict_value(info_dict, "change"), description, description.lower()))
+
+        self.__pending_changelists_cache = (time.monotonic(), self.user, self.client, changelists)
+        return changelists
+
     def get_or_make_changelist(self, changelist_description, case_sensitive=False):
         """
         Returns a changelist based on the description. Makes one if it doesn't exist
@@ -789,18 +1012,27 @@ class P4Client(object):
         else:
             return self.make_new_changelist(description=changelist_description)
 
-    def get_all_workspaces(self):
+    def get_all_workspaces(self, refresh=False):
         """
-        Returns a list of all workspaces that belong to this user
+        Returns a list of all workspaces that belong to this user. The list is cached per user after the first call
+
+        :param refresh: *bool* ask the server again instead of using the cached list
+        :return: *list* of workspace names
         """
+        if not refresh and self.__workspaces_cache is not None and self.__workspaces_cache[0] == self.user:
+            return list(self.__workspaces_cache[1])
+
         info_dicts = self.run_cmd("clients", args=["-u", self.user])
         workspaces = []
 
         for info_dict in info_dicts:
-            workspace = self.__get_dict_value(info_dict, "client")
+            workspace = get_dict_value(info_dict, "client")
             workspaces.append(workspace)
 
-        return workspaces
+        if None not in workspaces:
+            # don't hold on to the result of a failed call
+            self.__workspaces_cache = (self.user, workspaces)
+        return list(workspaces)
 
     def get_depot_paths(self, paths):
         """
@@ -813,12 +1045,18 @@ class P4Client(object):
         for path in paths:
             path = path.replace("\\", "/")
             path = path.rstrip("/")
-            if os.path.isdir(path):
+            if os.path.isdir(self.__root_path(path)):
                 path += "/..."
             updated_paths.append(path)
 
-        info_dicts = self.run_cmd("where", updated_paths)
-        depot_paths = [self.__get_dict_value(info, "depotFile").rstrip("/...") for info in info_dicts]
+        info_dicts = self.__where(updated_paths)
+        depot_paths = []
+        for info in info_dicts:
+            depot_path = get_dict_value(info, "depotFile")
+            # rstrip("/...") would strip any trailing dots and slashes, eg. the end of "file." as well
+            if depot_path is not None and depot_path.endswith("/..."):
+                depot_path = depot_path[:-len("/...")]
+            depot_paths.append(depot_path)
         return depot_paths
 
     def get_local_paths(self, paths):
@@ -837,8 +1075,8 @@ class P4Client(object):
                 path_ext = path_ext.split("#")[0]
             no_rev_paths.append("{}{}".format(path_without_ext, path_ext))
 
-        info_dicts = self.run_cmd("where", file_list=no_rev_paths)
-        local_paths = [self.__get_dict_value(info, "path") for info in info_dicts]
+        info_dicts = self.__where(no_rev_paths)
+        local_paths = [get_dict_value(info, "path") for info in info_dicts]
         return local_paths
 
     def get_history(self, paths):
@@ -848,31 +1086,68 @@ class P4Client(object):
         :param paths: *list* of file paths
         :return: *list* of change info
         """
-        info_dicts = []
-        for path in paths:
-            info_dicts.extend(self.run_cmd("changes", args=["-l", path]))
+        if not len(paths):
+            return []
 
-        # decode from bytes
-        if sys.version_info.major > 2:
-            info_dicts = decode_dictionaries(info_dicts)
+        # p4 changes takes any number of paths, one call gets the changes for all of them
+        return self.run_cmd("changes", args=["-l"], file_list=paths, decode=True)
 
-        return info_dicts
-
-    def host_online(self):
+    def host_online(self, use_cache=True):
         """
         Checks if the host for this client is online
 
+        :param use_cache: *bool* if True, the result of the last check is reused when it's less than
+        HOST_ONLINE_CACHE_TIME seconds old
         :return: *bool*
         """
+        if use_cache and self.__host_online_cache is not None:
+            check_time, online = self.__host_online_cache
+            if time.monotonic() - check_time < HOST_ONLINE_CACHE_TIME:
+                return online
+
         port = self.__port_number()
         host = self.__server_address()
 
         try:
             sock = socket.create_connection((host, port), timeout=2)
             sock.close()
-            return True
+            online = True
         except:
-            return False
+            online = False
+
+        self.__host_online_cache = (time.monotonic(), online)
+        return online
+
+    def __log_errors(self, info_dicts):
+        """
+        Logs the message of every error dictionary in info_dicts, unless this client is silent
+
+        :param info_dicts: *list* of info dictionaries
+        """
+        if self.silent:
+            return
+
+        for info_dict in info_dicts:
+            if get_dict_value(info_dict, "code") == "error":
+                logging.error(get_dict_value(info_dict, "data"))
+
+    def __check_connection_error(self, info_dicts):
+        """
+        Looks for p4's "Connect to server failed" error in the output of a command. If it's there, the server is marked
+        as offline so host_online doesn't have to open a connection to find that out. Any other answer means the server
+        is reachable again, so an earlier offline result isn't kept around
+
+        :param info_dicts: *list* of info dictionaries returned by a command
+        """
+        if not len(info_dicts):
+            return
+
+        if get_dict_value(info_dicts[0], "code") == "error" and \
+                "Connect to server failed" in str(get_dict_value(info_dicts[0], "data", "")):
+            logging.warning("Can't connect to %s on port %s" % (self.__server_address(), self.__port_number()))
+            self.__host_online_cache = (time.monotonic(), False)
+        else:
+            self.__host_online_cache = (time.monotonic(), True)
 
     def __server_address(self):
         """
@@ -880,8 +1155,7 @@ class P4Client(object):
 
         :return: *string* server address
         """
-        server = self.server.split(":")[-2]
-        return server
+        return self.__split_server()[0]
 
     def __port_number(self):
         """
@@ -889,8 +1163,20 @@ class P4Client(object):
 
         :return: *string* port number
         """
-        port = self.server.split(":")[-1]
-        return port
+        return self.__split_server()[1]
+
+    def __split_server(self):
+        """
+        Splits P4PORT into its server address and port. The result is kept until self.server changes
+
+        :return: *tuple* of server address and port strings
+        """
+        if self.__server_parts is None or self.__server_parts[0] != self.server:
+            # "ssl:perforce:1666" -> "ssl:perforce", "1666" -> "perforce"
+            protocol_and_address, _, port = self.server.rpartition(":")
+            address = protocol_and_address.rpartition(":")[2]
+            self.__server_parts = (self.server, (address, port))
+        return self.__server_parts[1]
 
     def __ensure_changelist(self, changelist):
         """
@@ -899,40 +1185,40 @@ class P4Client(object):
         :param changelist: *string* with cl description or *int* cl number
         :return:
         """
-        if type(changelist) == str:
-            try:
-                changelist = int(changelist)
-                return changelist
-            except:
-                pass
-            changelist = self.get_or_make_changelist(changelist)
+        if isinstance(changelist, str):
+            if changelist.strip().isdecimal():
+                return int(changelist)
+            return self.get_or_make_changelist(changelist)
 
-        elif type(changelist == bytes):
+        if isinstance(changelist, (bytes, float)):
             return int(changelist)
-        elif type(changelist == float):
-            return int(changelist)
-        elif type(changelist) == int:
-            return changelist
 
         return changelist
 
-    def __get_dict_value(self, dictionary, key, default_value=None):
+    def __where(self, paths):
         """
-        Python 3 treats the strings in the info dicts as bytes-type strings, Python 2 doesn't. This functions checks the
-        Python version and changes the keys and values accordingly
+        Runs "p4 where" on the paths. Results are cached per workspace, so paths that were already resolved don't
+        need another trip to the server. Only the WHERE_CACHE_SIZE most recently used paths are kept
 
-        :param dictionary: *dict* dictionary from where to get the info
-        :param key: *string* key you want the value of
-        :param default_value: default value to return in case the key doesn't exist
-        :return:
-        """
-        if sys.version_info.major == 2:
-            return dictionary.get(key, default_value)
-        else:
-            try:
-                return dictionary.get(key.encode(), default_value).decode()
-            except:
-                return dictionary.get(key, default_value)
+        :param paths: *list* of file paths
+        :return: *list* of info dictionaries, one per path
+        """
+        cached = [self.__where_cache.get((self.client, path)) for path in paths]
+        if None not in cached:
+            for path in paths:
+                self.__where_cache.move_to_end((self.client, path))
+            return cached
+
+        info_dicts = self.run_cmd("where", file_list=paths)
+        # only cache when every path maps to exactly one result, otherwise we can't tell which result is whose
+        if len(info_dicts) == len(paths):
+            for path, info_dict in zip(paths, info_dicts):
+                if get_dict_value(info_dict, "code") != "error":
+                    self.__where_cache[(self.client, path)] = info_dict
+                    self.__where_cache.move_to_end((self.client, path))
+            while len(self.__where_cache) > WHERE_CACHE_SIZE:
+                self.__where_cache.popitem(last=False)
+        return info_dicts
 
     def fstat_to_p4_files(self, fstat_output_list, allow_invalid_files=False):
         """
@@ -943,40 +1229,48 @@ class P4Client(object):
         marked for delete
         :return:
         """
-        p4files = []
-        p4_client = self.find_p4_client()
-        for file_dict in fstat_output_list:
-            p4file = P4File()
-            p4file.set_depot_file_path(self.__get_dict_value(file_dict, "depotFile"))
-            p4file.set_local_file_path(self.__get_dict_value(file_dict, "clientFile"))
-            p4file.set_have_revision(self.__get_dict_value(file_dict, "haveRev"))
-            p4file.set_head_revision(self.__get_dict_value(file_dict, "headRev"))
-            p4file.set_last_submit_time(self.__get_dict_value(file_dict, "headTime"))
-            p4file.set_action(self.__get_dict_value(file_dict, "action"))
-            p4file.set_head_action(self.__get_dict_value(file_dict, "headAction"))
-            p4file.set_raw_data(str(file_dict))
-
-            opened_by = []
-            for key, value in file_dict.items():
-                other_open = "otherOpen" if sys.version_info.major == 2 else "otherOpen".encode()
-                if other_open in key and key != other_open:
-                    value = self.__get_dict_value(file_dict, key)
-                    opened_by.append(value)
-                action_owner = "actionOwner" if sys.version_info == 2 else "actionOwner".encode()
-                if action_owner in key:
-                    value = self.__get_dict_value(file_dict, key)
-                    value = value.decode() + "@" + p4_client
-                    opened_by.append(value.encode())
-
-            p4file.set_checked_out_by(opened_by)
-            if allow_invalid_files:
-                p4files.append(p4file)
-            else:
-                if p4file.is_valid():
-                    if not p4file.is_deleted() and not p4file.is_moved_deleted():
-                        p4files.append(p4file)
+        if not allow_invalid_files:
+            fstat_output_list = [file_dict for file_dict in fstat_output_list if self.__is_listable_file(file_dict)]
 
-        return p4files
+        return [self.__fstat_dict_to_p4file(file_dict, self.client) for file_dict in fstat_output_list]
+
+    def __is_listable_file(self, file_dict):
+        """
+        Same checks as P4File.is_valid, is_deleted and is_moved_deleted, done on the fstat dictionary so no P4File
+        needs to be made for files that get skipped
+
+        :param file_dict: *dict* info dictionary generated by the fstat command
+        :return: *bool*
+        """
+        if get_dict_value(file_dict, "depotFile") is None and \
+                get_dict_value(file_dict, "clientFile") is None:
+            return False
+        if get_dict_value(file_dict, "headAction") in _DELETED_HEAD_ACTIONS or \
+                get_dict_value(file_dict, "action") == "move/delete":
+            return False
+        return True
+
+    def __fstat_dict_to_p4file(self, file_dict, p4_client):
+        """
+        Turns a single fstat info dictionary into a P4File, including who has the file checked out
+
+        :param file_dict: *dict* info dictionary generated by the fstat command
+        :param p4_client: *string* client name to add to this user's own checkouts
+        :return: *P4File*
+        """
+        p4file = P4File.from_fstat_dict(file_dict, get_dict_value)
+
+        opened_by = []
+        for key, value in file_dict.items():
+            # otherOpen0, otherOpen1, ... hold the users, otherOpen itself is just the count
+            if key.startswith(_OTHER_OPEN_KEY) and key != _OTHER_OPEN_KEY:
+                opened_by.append(value)
+            elif key.startswith(_ACTION_OWNER_KEY):
+                value = value.decode() + "@" + p4_client
+                opened_by.append(value.encode())
+
+        p4file.set_checked_out_by(opened_by)
+        return p4file
 
     def __p4config_exists(self):
         """
@@ -986,19 +1280,39 @@ class P4Client(object):
         :return: *bool*
         """
         starting_dir = self.perforce_root
-        last_dir = ""
+        config_root = P4Client.__p4config_roots.get(starting_dir)
+        if config_root is not None:
+            self.perforce_root = config_root
+            return True
+
         current_dir = starting_dir
+        while True:
+            # a single stat per folder instead of listing everything in it
+            try:
+                os.stat(os.path.join(current_dir, ".p4config"))
+                # only found folders are remembered, a .p4config that gets made later should still be picked up
+                P4Client.__p4config_roots[starting_dir] = current_dir
+                self.perforce_root = current_dir
+                return True
+            except OSError:
+                pass
 
-        while last_dir != current_dir:
-            if os.path.exists(current_dir):
-                if ".p4config" in os.listdir(current_dir):
-                    logging.info(".p4config found in %s" % current_dir)
-                    self.perforce_root = current_dir
-                    return True
+            parent_dir = os.path.dirname(current_dir)
+            if parent_dir == current_dir:
+                return False
+            current_dir = parent_dir
 
-            last_dir = current_dir
-            current_dir = os.path.dirname(last_dir)
-        return False
+    def __root_path(self, path):
+        """
+        p4 runs with perforce_root as its working directory, so it resolves relative paths against that folder. This
+        does the same for checks done in Python, which would otherwise look relative to the current working directory
+
+        :param path: *string* file or folder path
+        :return: *string* path, joined onto perforce_root if it was relative
+        """
+        if not self.perforce_root or os.path.isabs(path):
+            return path
+        return os.path.join(self.perforce_root, path)
 
     def __validate_file_list(self, file_list):
         """
@@ -1007,13 +1321,18 @@ class P4Client(object):
         :param file_list: List of files to iterate
         :return:
         """
-        file_list = convert_to_list(file_list) if not isinstance(file_list, list) else file_list
+        file_list = convert_to_list(file_list)
 
         # Easy utility to check that the file is underneath the correct perforce root
         # Quicker than waiting for the result of a p4 fstat
-        for f in file_list:
-            if not f.lower().startswith(self.perforce_root.lower()):
-                raise Exception(f'{f} is not under perforce root: {self.perforce_root}')
+        # most paths share the exact prefix with the root, only lower-case the ones that don't
+        perforce_root = self.perforce_root
+        perforce_root_lower = perforce_root.lower()
+        invalid_file = next((f for f in file_list
+                             if not f.startswith(perforce_root) and not f.lower().startswith(perforce_root_lower)),
+                            None)
+        if invalid_file is not None:
+            raise Exception(f'{invalid_file} is not under perforce root: {self.perforce_root}')
 
 
 def split_list_into_strings_of_length(input_list, max_length=100):
@@ -1023,42 +1342,188 @@ def split_list_into_strings_of_length(input_list, max_length=100):
     :param input_list:
     :param max_length: str clamp length
     """
-    full_list_str = " ".join([str(arg) for arg in input_list])
-
-    # if str is already below max length, just return it wrapped in a list
-    if not len(full_list_str) > max_length:
-        return [full_list_str]
+    # measure the arguments first and join every chunk once, instead of rebuilding a growing string per argument
+    return [" ".join(chunk) for chunk in split_list_into_chunks_of_length(input_list, max_length=max_length)]
 
-    # Keep appending on the last string until we hit the max length
-    # then add a new entry to the list and keep appending
-    clamped_str_list = [""]
-    for arg in input_list:
-        current_str = clamped_str_list[-1]
-        new_str = "{}{} ".format(current_str, arg)  # the space is deliberately placed, since the first item has no len
+def remove_nested_folders(folder_list):
+    """
+    Cleans up the folder paths and drops any folder that is already covered by another folder in the list, so
+    ["//a/b/", "//a/b/c/"] becomes ["//a/b"]
 
-        # if new string is too long, just append the arg as a new item and skip to next arg
-        if len(new_str) >= max_length:
-            clamped_str_list.append("{} ".format(arg))  #
+    :param folder_list: *list* of folder paths
+    :return: *list* of folder paths with forward slashes and no trailing slash
+    """
+    cleaned_folders = [folder.replace("\\", "/").rstrip("/") for folder in folder_list]
+
+    kept_folders = []
+    kept_folder_set = set()
+    # shortest paths first, so parent folders are always kept before their children are looked at
+    for folder in sorted(cleaned_folders, key=len):
+        parts = folder.split("/")
+        if any("/".join(parts[:index]) in kept_folder_set for index in range(1, len(parts) + 1)):
             continue
+        kept_folders.append(folder)
+        kept_folder_set.add(folder)
+    return kept_folders
+
+def recursive_folder_paths(folder_list):
+    """
+    Turns folder paths into p4 paths that include everything below them, so "D:\\project\\" becomes "D:/project/..."
+
+    :param folder_list: *list* of folder paths
+    :return: *list* of p4 paths
+    """
+    return [folder.replace("\\", "/").rstrip("/") + "/..." for folder in folder_list]
 
-        # set latest to updated string
-        clamped_str_list[-1] = new_str
+def split_list_into_chunks_of_length(input_list, max_length=100, encoding="utf-8"):
+    """
+    From incoming list of arguments, build lists of string arguments whose combined length, with a space between each
+    argument, stays below max_length. An argument that's longer than max_length on its own gets a list of its own.
+    Lengths are counted in encoded bytes, since that's what the OS limit on the command line is measured in.
 
-    return clamped_str_list
+    :param input_list:
+    :param max_length: *int* clamp length
+    :param encoding: *string* encoding the arguments get passed to the OS with
+    :return: *list* of lists of strings, always holds at least one (possibly empty) list
+    """
+    chunks = [[]]
+    chunk_length = 0
+    for arg in input_list:
+        arg = str(arg)
+        # for ascii the byte count is the character count, only encode the paths that need it
+        arg_length = (len(arg) if arg.isascii() else len(arg.encode(encoding, "replace"))) + 1  # + 1 for the space
+        if chunks[-1] and chunk_length + arg_length >= max_length:
+            chunks.append([])
+            chunk_length = 0
+        chunks[-1].append(arg)
+        chunk_length += arg_length
+
+    return chunks
+
+def decode_dictionary(info_dict):
+    """
+    Decode the keys and values of a single marshaled dictionary into unicode from bytes
+    """
+    decode = bytes.decode
+    return {decode(k, "utf-8", "replace"): decode(v, "utf-8", "replace") if type(v) is bytes else v
+            for k, v in info_dict.items()}
 
 def decode_dictionaries(info_dicts):
     """
     Decode list of dictionary keys and values into unicode from bytes
     """
-    decoded_dicts = []
-    for info_dict in info_dicts:
-        decoded_dict = {k.decode(): v.decode() for k, v in info_dict.items()}
-        decoded_dicts.append(decoded_dict)
-    return decoded_dicts
+    return [decode_dictionary(info_dict) for info_dict in info_dicts]
+
+def list_files_in_folder(folder, include_subfolders=True, max_workers=1):
+    """
+    Returns the paths of all the files in a folder. Uses os.scandir, so the file type comes from the directory
+    listing and no extra stat is needed per file
+
+    :param folder: *string*
+    :param include_subfolders: *bool*
+    :param max_workers: *int* number of threads that list folders at the same time. Listing a folder mostly waits on
+    the filesystem, so on network drives this helps a lot
+    :return: *list* of file paths
+    """
+    if not include_subfolders:
+        with os.scandir(folder) as entries:
+            return [entry.path for entry in entries if entry.is_file()]
+
+    return list_files_in_folders([folder], max_workers=max_workers)
+
+def list_files_in_folders(folders, max_workers=1):
+    """
+    Returns the paths of all the files in the folders and their subfolders. Every level of subfolders is listed
+    by up to max_workers threads at the same time
+
+    :param folders: *list* of folder paths
+    :param max_workers: *int* number of threads that list folders at the same time
+    :return: *list* of file paths
+    """
+    all_files = []
+    folders_to_scan = list(folders)
+    if max_workers <= 1:
+        while folders_to_scan:
+            files, subfolders = _scan_folder(folders_to_scan.pop())
+            all_files.extend(files)
+            folders_to_scan.extend(subfolders)
+        return all_files
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while folders_to_scan:
+            next_folders = []
+            for files, subfolders in pool.map(_scan_folder, folders_to_scan):
+                all_files.extend(files)
+                next_folders.extend(subfolders)
+            folders_to_scan = next_folders
+    return all_files
+
+def _scan_folder(folder):
+    """
+    Lists a single folder
+
+    :param folder: *string*
+    :return: *tuple* of a list of file paths and a list of subfolder paths
+    """
+    files = []
+    subfolders = []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    # like os.walk, symlinked folders aren't followed
+                    if not entry.is_symlink():
+                        subfolders.append(entry.path)
+                else:
+                    files.append(entry.path)
+    except OSError:
+        # os.walk skipped folders it couldn't read as well
+        pass
+    return files, subfolders
+
+@functools.lru_cache(maxsize=64)
+def encode_key(key):
+    """
+    Returns the bytes version of a p4 -G dictionary key. The same handful of keys gets looked up for every file, so
+    the encoded keys are cached
+
+    :param key: *string*
+    :return: *bytes*
+    """
+    return key.encode()
+
+def get_dict_value(dictionary, key, default_value=None):
+    """
+    The strings in the info dicts are bytes-type strings. This looks up the bytes version of the key and decodes the
+    value
+
+    :param dictionary: *dict* dictionary from where to get the info
+    :param key: *string* key you want the value of
+    :param default_value: default value to return in case the key doesn't exist
+    :return:
+    """
+    value = dictionary.get(encode_key(key))
+    if value is None:
+        # dictionaries that weren't made by p4 -G, like the error ones from run_cmd, have str keys
+        return dictionary.get(key, default_value)
+    return value.decode("utf-8", "replace") if type(value) is bytes else value
+
+def fstat_field_args(fields):
+    """
+    Returns the fstat arguments that limit the output to the given fields
+
+    :param fields: *list* or *tuple* of field names, a single field name, or None for all fields
+    :return: *list* of arguments
+    """
+    if not fields:
+        return []
+    if isinstance(fields, str):
+        return ["-T", fields]
+    return ["-T", ",".join(fields)]
 
 def convert_to_list(value):
+    if isinstance(value, list):
+        return value
     if isinstance(value, tuple):
-        converted = [v for v in value]
-    else:
-        converted = [value]
-    return converted
\ No newline at end of file
+        return list(value)
+    return [value]
\ No newline at end of file
@@ -15,6 +15,17 @@ class Status:
 
 
 class P4File(object):
+    __slots__ = ("__local_file_path", "__depot_file_path", "__last_submitted_by", "__have_revision",
+                 "__head_revision", "__checked_out_by", "__last_submit_time", "__action", "__raw_data",
+                 "__head_action", "__status")
+
+    # the slot names as they end up on the class after name mangling
+    _ATTRIBUTES = [
+        '_P4File__local_file_path', '_P4File__depot_file_path', '_P4File__last_submitted_by',
+        '_P4File__have_revision', '_P4File__head_revision', '_P4File__checked_out_by',
+        '_P4File__last_submit_time', '_P4File__action', '_P4File__raw_data', '_P4File__head_action'
+    ]
+
     def __init__(self, local_file_path=None, depot_file_path=None):
         super(P4File, self).__init__()
         self.__local_file_path = local_file_path
@@ -28,15 +39,51 @@ class P4File(object):
         self.__action = None
         self.__raw_data = None
         self.__head_action = None
+        self.__status = None
+
+    @classmethod
+    def from_fstat_dict(cls, fstat_dict, get_value):
+        """
+        Makes a P4File straight from an fstat info dictionary
+
+        :param fstat_dict: *dict* info dictionary generated by the fstat command
+        :param get_value: function that takes the dictionary and a key and returns the decoded value
+        :return: *P4File*
+        """
+        p4file = cls(local_file_path=get_value(fstat_dict, "clientFile"),
+                     depot_file_path=get_value(fstat_dict, "depotFile"))
+        p4file.set_have_revision(get_value(fstat_dict, "haveRev"))
+        p4file.set_head_revision(get_value(fstat_dict, "headRev"))
+        p4file.set_last_submit_time(get_value(fstat_dict, "headTime"))
+        p4file.__action = get_value(fstat_dict, "action")
+        p4file.__head_action = get_value(fstat_dict, "headAction")
+        # kept as the dictionary itself, get_raw_data only turns it into a string when someone asks for it
+        p4file.__raw_data = fstat_dict
+        return p4file
 
     def update_self(self, p4client):
+        """
+        Asks the server for the latest information on this file. To update a lot of files, use
+        P4Client.refresh_p4files instead, that does them all with a single fstat call
+
+        :param p4client: *P4Client*
+        """
         if self.__depot_file_path is not None:
             search_file = self.__depot_file_path
         else:
             search_file = self.__local_file_path
 
         copy_of_self = p4client.files_to_p4files([search_file])[0]
-        self.__dict__.update(copy_of_self.__dict__)
+        self.update_from(copy_of_self)
+
+    def update_from(self, other):
+        """
+        Copies all the information of another P4File onto this one
+
+        :param other: *P4File*
+        """
+        for attr in self._ATTRIBUTES:
+            setattr(self, attr, getattr(other, attr))
 
     def update_last_submitted_by(self, p4client):
         info_dict = p4client.run_cmd("changes", [self.__depot_file_path])[0]
@@ -58,7 +105,7 @@ class P4File(object):
         return False
 
     def is_untracked(self):
-        if "- no such file(s)" in self.__raw_data:
+        if self.__raw_data_contains("- no such file(s)"):
             return True
         return False
 
@@ -101,7 +148,7 @@ class P4File(object):
         return False
 
     def is_under_client_root(self):
-        if "is not under client's root" in self.__raw_data:
+        if self.__raw_data_contains("is not under client's root"):
             return False
         return True
 
@@ -117,25 +164,33 @@ class P4File(object):
                 return False
 
     def get_status(self):
-        if self.is_marked_for_delete():
+        # same order of checks as the is_* methods, but reading every attribute only once since this gets called for
+        # every file in big listings
+        action = self.__action
+        head_action = self.__head_action
+        have_revision = self.__have_revision
+        head_revision = self.__head_revision
+
+        if action == "delete":
             return Status.OPEN_FOR_DELETE
-        if self.is_deleted():
+        if head_action == "delete":
             return Status.DELETED
-        if self.is_moved_deleted():
+        if action == "move/delete" or head_action == "move/delete":
             return Status.MOVED_DELETED
-        if self.needs_syncing():
-            return Status.NEED_SYNC
-        if self.is_depot_only():
+        if head_revision is not None and action != "add" and action != "edit":
+            if have_revision is None or have_revision < head_revision:
+                return Status.NEED_SYNC
+        if have_revision is None and head_revision is not None:
             return Status.DEPOT_ONLY
-        if self.is_open_for_add():
+        if action == "add":
             return Status.OPEN_FOR_ADD
-        if self.is_open_for_edit():
+        if action == "edit":
             return Status.OPEN_FOR_EDIT
-        if self.is_local_only():
+        if self.__raw_data_contains("- no such file(s)"):
             return Status.UNTRACKED
-        if self.is_moved_added():
+        if action == "move/add":
             return Status.MOVED
-        if self.__have_revision == self.__head_revision:
+        if have_revision == head_revision:
             return Status.UP_TO_DATE
 
     def set_status(self, value):
@@ -147,7 +202,18 @@ class P4File(object):
     def set_head_action(self, value):
         self.__head_action = value
 
+    def __raw_data_contains(self, text):
+        raw_data = self.__raw_data
+        if isinstance(raw_data, dict):
+            # p4 reports these messages in the data field of its error dictionaries
+            raw_data = raw_data.get(b"data", raw_data.get("data", ""))
+            if isinstance(raw_data, bytes):
+                raw_data = raw_data.decode("utf-8", "replace")
+        return text in raw_data
+
     def get_raw_data(self):
+        if isinstance(self.__raw_data, dict):
+            return str(self.__raw_data)
         return self.__raw_data
 
     def set_raw_data(self, value):
@@ -217,13 +283,7 @@ class P4File(object):
         if not isinstance(other, P4File):
             return NotImplemented
 
-        private_attributes = [
-            '_P4File__local_file_path', '_P4File__depot_file_path', '_P4File__last_submitted_by',
-            '_P4File__have_revision', '_P4File__head_revision', '_P4File__checked_out_by',
-            '_P4File__last_submit_time', '_P4File__action', '_P4File__raw_data', '_P4File__head_action'
-        ]
-
-        for attr in private_attributes:
+        for attr in self._ATTRIBUTES:
             if getattr(self, attr) != getattr(other, attr):
                 return False
         return True
\ No newline at end of file
@@ -2,29 +2,35 @@ import os
 
 class P4StatusIcon(object):
     path_cache = {}
+    _initialized = False
 
     @classmethod
     def get_path(cls, status):
         """
         Get the path to one of the icons, using a P4File.Status constant as identifier.
-        This will also cache the info when a match is found so feel free to hammer it.
+        The icon folder is only looked through once, after that this is a dictionary lookup so feel free to hammer it.
 
         :param cls:
         :param status: a P4File.Status constant.
         :return: Path to the Icon resource. None if file does not exist or the status is undefined.
         """
-        path = cls.path_cache.get(status, None)
-        if path:
-            return path
+        if not cls._initialized:
+            cls.__scan_icons()
 
-        this_dir = os.path.dirname(os.path.realpath(__file__))
-        if status:
-            filename = "perforce_" + status + ".png"
-            full_path = os.path.join(this_dir, filename)
-            if os.path.exists(full_path):
-                cls.path_cache[status] = full_path
-                return full_path
-            else:
-                return None
-        else:
+        if not status:
             return None
+        return cls.path_cache.get(status, None)
+
+    @classmethod
+    def __scan_icons(cls):
+        """
+        Fills path_cache with every perforce_<STATUS>.png found next to this file
+        """
+        this_dir = os.path.dirname(os.path.realpath(__file__))
+        prefix = "perforce_"
+        extension = ".png"
+        for entry in os.scandir(this_dir):
+            if entry.name.startswith(prefix) and entry.name.endswith(extension) and entry.is_file():
+                status = entry.name[len(prefix):-len(extension)]
+                cls.path_cache[status] = os.path.join(this_dir, entry.name)
+        cls._initialized = True